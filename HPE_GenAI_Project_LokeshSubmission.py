@@ -16,99 +16,208 @@ About Project:
         - Cash Flow Statement
 5. Other Packages
    a) Used spacy & fitz from PyMuPDF for extracting texts
-   b) Used camelot for extracting tables
+   b) Used fitz table detection & camelot as fallback for extracting tables
    c) Used RetrievalQA for question answersing tasks
-   d) Used VectorstoreIndexCreator to convert docuemnts & retrieval of information
+   d) Used OpenAIEmbeddings with FAISS vectorstore to convert docuemnts & retrieval of information
 
 ================================================================================================================== '''
 
 import os
+import hashlib
 import tempfile
 import streamlit as st
-import spacy
 import fitz
-import pandas as pd
-import camelot
 import re
-from langchain.document_loaders import PyMuPDFLoader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.llms import OpenAI
-from langchain.chains import RetrievalQA
-from langchain.indexes import VectorstoreIndexCreator
+
+# Heavy libraries (spacy, camelot, pandas, langchain) are imported inside the functions using them,
+# so the page renders without loading them until a PDF is uploaded
 
 openai_api_key = os.getenv("OPENAI_API_KEY")       
 
-def load_pdf_and_create_index(file_content):
-    with tempfile.NamedTemporaryFile(delete=False, suffix="pdf") as temp_file_qa:
-        temp_file_qa.write(file_content)
-        temp_file_path_qa = temp_file_qa.name
+# Keywords used to identify the Key Financial Statement tables
+KEYWORDS = ["Earnings before provision for taxes", "total current assets", "total current liabilities",
+            "net cash provided by operating activities","net cash used in investing activities"]
+KEYWORDS_RE = re.compile("|".join(re.escape(keyword) for keyword in KEYWORDS), re.IGNORECASE)
+# Earnings Statement, Balance Sheet & Cash Flow Statement
+MAX_KEY_TABLES = 3
+
+# Number of leading pages searched for the Company Name
+COVER_PAGES = 3
+# Per-page character cap on NER input, keeps spaCy Doc allocation bounded on dense pages
+NER_MAX_CHARS = 10000
+COMPANY_RE = re.compile(r'company|inc\.|ltd|enterprise|corporation', re.IGNORECASE)
+
+# Page.find_tables() is only available from PyMuPDF 1.23, older versions use camelot for every table
+FITZ_FIND_TABLES = hasattr(fitz.Page, "find_tables")
+
+# Set when camelot lattice parsing fails (e.g. Ghostscript is missing), later extractions use stream only
+_lattice_unavailable = False
+
+# Per-PDF caches are process-wide, so only the most recent uploads are kept
+CACHE_MAX_ENTRIES = 3
 
-    loader  = PyMuPDFLoader(temp_file_path_qa)
-    pages   = loader.load_and_split()
+# Financial Statement Period as stated on the cover page of Form 10-Q / 10-K
+DATE_RE = re.compile(r'for the (?:quarterly|fiscal) period ended:\s*\w+\s\d{1,2},\s\d{4}|for the\s+fiscal year ended:\s*\w+\s\d{1,2},\s\d{4}', re.IGNORECASE)
 
-    text_splitter       = CharacterTextSplitter(separator="\n", chunk_size=2000, chunk_overlap=200)
+# Keyed by PDF content hash so reruns on the same upload reuse the built index;
+# the page texts are excluded from the cache key
+@st.cache_resource(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def load_pdf_and_create_index(file_hash, _page_texts):
+    from langchain.schema import Document
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain.embeddings import OpenAIEmbeddings
+    from langchain.vectorstores import FAISS
+
+    # Reuse the page texts already extracted with fitz instead of re-parsing the PDF
+    pages   = [Document(page_content=page_text, metadata={"page": i}) for i, page_text in enumerate(_page_texts)]
+
+    text_splitter       = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
     texts               = text_splitter.split_documents(pages)
-    index_creator       = VectorstoreIndexCreator()
-    vectorstore_index   = index_creator.from_documents(texts).vectorstore
+
+    embeddings          = OpenAIEmbeddings()
+    vectorstore_index   = FAISS.from_documents(texts, embeddings)
 
     return vectorstore_index
 
-def extract_text_from_pdf(file_content):
-    doc = fitz.open(stream=file_content, filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
-    return text
-
-def extract_company_name(text):
-    nlp = spacy.load("en_core_web_sm")
-    doc = nlp(text)
-    company_names = [ent.text for ent in doc.ents if ent.label_ == "ORG"]
+# LLM & QA chain are built once per uploaded PDF instead of on every rerun
+@st.cache_resource(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def _get_qa(file_hash, _vectorstore_index):
+    from langchain.llms import OpenAI
+    from langchain.chains import RetrievalQA
+
+    llm = OpenAI(temperature=0.3)
+
+    qa = RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",
+        retriever=_vectorstore_index.as_retriever(search_kwargs={"fetch_score": True}),
+        return_source_documents=True,
+    )
+    return qa
+
+# Extraction results are cached on the PDF content hash; underscore arguments are not hashed
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def extract_text_from_pdf(file_hash, _file_content):
+    with fitz.open(stream=_file_content, filetype="pdf") as doc:
+        page_texts = [page.get_text() for page in doc]
+    return page_texts
+
+@st.cache_resource(show_spinner=False)
+def _get_nlp():
+    import spacy
+
+    # Only NER is used downstream, so skip loading the other pipeline components
+    return spacy.load("en_core_web_sm", disable=["tagger", "parser", "lemmatizer", "attribute_ruler"])
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def extract_company_name(file_hash, _page_texts):
+    nlp = _get_nlp()
+    # Company Name appears on the cover page, so only the first few pages are run through NER
+    docs = nlp.pipe((page_text[:NER_MAX_CHARS] for page_text in _page_texts[:COVER_PAGES]), batch_size=4)
+    company_names = [ent.text for doc in docs for ent in doc.ents if ent.label_ == "ORG"]
     return company_names
 
-def contains_keywords(text, keywords):
-    return any(keyword.lower() in text.lower() for keyword in keywords)
-
-def extract_key_tables_from_pdf(file_content, keywords):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-        temp_file.write(file_content)
-        temp_file_path = temp_file.name
-
-    if temp_file_path:
-        try:          
-            tables = camelot.read_pdf(temp_file_path, pages='all', flavor='stream')
-            keyword_tables = []
-            for table in tables:
-                page = table.page
-                table_bbox = table._bbox
-                table_df = table.df
-                
-                # Extract text around the table
-                doc = fitz.open(temp_file_path)
-                page_text = doc[page - 1].get_text("text", clip=table_bbox)
-                
-                if contains_keywords(page_text, keywords):
-                    keyword_tables.append(table_df)
-            
-            doc.close()
-            return keyword_tables
+def contains_keywords(text):
+    return bool(KEYWORDS_RE.search(text))
+
+def _add_camelot_keyword_tables(tables, doc, tables_by_page):
+    matched_pages = set()
+    for table in tables:
+        page = table.page
+        table_bbox = table._bbox
+        table_df = table.df
         
-        except Exception as e:
-            st.error(f"An error occurred while reading key tables from PDF: {e}")
-            return []
+        # Extract text around the table from the already opened document
+        page_text = doc[page - 1].get_text("text", clip=table_bbox)
         
-    else:
-        st.error("Failed to save the uploaded PDF file.")
+        if contains_keywords(page_text):
+            tables_by_page.setdefault(page, []).append(table_df)
+            matched_pages.add(page)
+    return matched_pages
+
+# Errors propagate to the caller so a failed extraction is not cached for this PDF
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def extract_key_tables_from_pdf(file_hash, _file_content, _page_texts):
+    global _lattice_unavailable
+
+    # Only hand camelot the pages whose text mentions one of the keywords
+    candidate_pages = [i + 1 for i, page_text in enumerate(_page_texts) if contains_keywords(page_text)]
+    if not candidate_pages:
         return []
 
-def extract_specific_dates(text):
-    date_pattern = r'(for the (quarterly|fiscal) period ended:\s*(\w+\s\d{1,2},\s\d{4}))|(for the  fiscal year ended:\s*(\w+\s\d{1,2},\s\d{4}))'
-    matches = re.findall(date_pattern, text.lower())
+    # The PDF is only parsed here on a cache miss; the same Document serves fitz & camelot lookups
+    with fitz.open(stream=_file_content, filetype="pdf") as doc:
+        # Try PyMuPDF's built-in table detection first, it works on the already parsed pages
+        tables_by_page = {}
+        camelot_pages = []
+        found_tables = 0
+        for page_number in candidate_pages:
+            # Tables on later pages cannot make it into the first MAX_KEY_TABLES
+            if found_tables >= MAX_KEY_TABLES:
+                break
+
+            page = doc[page_number - 1]
+            page_tables = []
+            if FITZ_FIND_TABLES:
+                try:
+                    tabs = page.find_tables()
+                except Exception as e:
+                    st.warning(f"PyMuPDF table detection failed on page {page_number}, using camelot: {e}")
+                    tabs = None
+                if tabs is not None:
+                    # Only tables with a detected header row are kept, otherwise the period columns are unlabelled;
+                    # empty filler columns between the amounts are dropped
+                    page_tables = [tab.to_pandas().dropna(axis=1, how="all") for tab in tabs.tables
+                                   if tab.header.external and contains_keywords(page.get_text("text", clip=tab.bbox))]
+
+            # A page with no usable keyword table from fitz (or where fitz failed) is left to camelot
+            if not page_tables:
+                camelot_pages.append(page_number)
+                continue
+            tables_by_page[page_number] = page_tables
+            found_tables += len(page_tables)
+
+        # Fall back to camelot for pages where fitz found no keyword table
+        if camelot_pages:
+            import camelot
+
+            # camelot reads from a file path, so the upload is only written to disk when it is needed
+            with tempfile.TemporaryDirectory() as temp_dir:
+                pdf_path = os.path.join(temp_dir, "uploaded.pdf")
+                with open(pdf_path, "wb") as temp_file:
+                    temp_file.write(_file_content)
+
+                # Financial statement tables are often ruled, so lattice is tried first and pages where it
+                # finds no keyword table are re-read with stream. Worst case (unruled pages) this costs a
+                # lattice pass with Ghostscript rasterisation plus a stream pass, more than stream alone.
+                tables = []
+                if not _lattice_unavailable:
+                    try:
+                        tables = camelot.read_pdf(pdf_path, pages=",".join(map(str, camelot_pages)), flavor='lattice',
+                                                  line_scale=40, suppress_stdout=True)
+                    except Exception as e:
+                        _lattice_unavailable = True
+                        st.warning(f"Lattice table parsing is unavailable, using stream parsing only: {e}")
+                matched_pages = _add_camelot_keyword_tables(tables, doc, tables_by_page)
+
+                # Re-read with stream only the pages where lattice found no keyword table
+                stream_pages = [page_number for page_number in camelot_pages if page_number not in matched_pages]
+                if stream_pages:
+                    tables = camelot.read_pdf(pdf_path, pages=",".join(map(str, stream_pages)), flavor='stream',
+                                              suppress_stdout=True)
+                    _add_camelot_keyword_tables(tables, doc, tables_by_page)
+
+    # Keep tables in document order regardless of which extractor found them
+    keyword_tables = [table_df for page_number in candidate_pages for table_df in tables_by_page.get(page_number, [])]
+    keyword_tables = keyword_tables[:MAX_KEY_TABLES]
     
-    # Extracting Financial Statement Period
-    df_period = pd.DataFrame(matches)
-    doc_period = df_period[0][0].title()        
+    return keyword_tables
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def extract_specific_dates(file_hash, _text):
+    # Extracting Financial Statement Period from the first match only
+    match = DATE_RE.search(_text)
+    doc_period = match.group(0).title() if match else None
     return doc_period
     
     
@@ -133,25 +242,26 @@ def main():
         try:
             file_content = pdf_file.read()
             
+            file_hash = hashlib.sha256(file_content).hexdigest()
+
             # Extract text from the uploaded PDF file
-            text = extract_text_from_pdf(file_content)
+            page_texts = extract_text_from_pdf(file_hash, file_content)
+            text = "".join(page_texts)
             
             st.write("========================================================================================")
             st.subheader("Key Points on Document Uploaded:")
             
             with st.expander("Company Name & Period Ending"):            
                 # Calling UDF to Extract Company Name
-                company_names = extract_company_name(text)            
+                company_names = extract_company_name(file_hash, page_texts)            
                 if company_names:
-                    df = pd.DataFrame(company_names, columns=["Company Name"])
-                    filtered_df = df[df["Company Name"].str.lower().str.contains("company|inc.|ltd|enterprise|corporation")]
-                    first_company = filtered_df.iloc[0]["Company Name"] if not filtered_df.empty else "Unknown"
+                    first_company = next((name for name in company_names if COMPANY_RE.search(name)), "Unknown")
                     st.write(f" - {first_company.title()}")
                 else:
                     st.write("No company names found in the document.")
     
                 # Calling UDF to Extract Period Ending
-                doc_period = extract_specific_dates(text)
+                doc_period = extract_specific_dates(file_hash, text)
                 if doc_period:
                     st.write(f" - {doc_period}")
                 else:
@@ -159,10 +269,11 @@ def main():
 
             with st.expander("Key Financial Statements"):                
                 # Calling UDF to Extract Tables with specific keywords
-                keywords = ["Earnings before provision for taxes", "total current assets", "total current liabilities",
-                            "net cash provided by operating activities","net cash used in investing activities"]
-                
-                dataframes = extract_key_tables_from_pdf(file_content, keywords)
+                try:
+                    dataframes = extract_key_tables_from_pdf(file_hash, file_content, page_texts)
+                except Exception as e:
+                    st.error(f"An error occurred while reading key tables from PDF: {e}")
+                    dataframes = []
                 
                 # Assigning labels to Tables
                 table_labels = ["Consolidated Statements of Earnings", "Consolidated Balance Sheets", "Consolidated Statements of Cash Flows"]
@@ -176,16 +287,8 @@ def main():
         
             try:
                 # Calling UDF - Language model and QA section
-                vectorstore_index = load_pdf_and_create_index(file_content)
-            
-                llm = OpenAI(temperature=0.3)
-            
-                qa = RetrievalQA.from_chain_type(
-                    llm=llm,
-                    chain_type="stuff",
-                    retriever=vectorstore_index.as_retriever(search_kwargs={"fetch_score": True}),
-                    return_source_documents=True,
-                )
+                vectorstore_index = load_pdf_and_create_index(file_hash, page_texts)
+                qa = _get_qa(file_hash, vectorstore_index)
             
                 with st.expander("Q & A with uploaded Financial Statement"):
                     query = st.text_input("Ask a question about the financial report")